@@ -3,37 +3,56 @@ Core security module handling password hashing, JWT token generation,
 and user authentication dependencies.
 
 Dependencies:
-    - passlib: For bcrypt password hashing.
-    - python-jose: For encoding/decoding JWT tokens.
+    - bcrypt: For bcrypt password hashing (native C bindings).
+    - PyJWT: For encoding/decoding JWT tokens (HMAC via OpenSSL).
     - fastapi.security: For OAuth2 password flow implementation.
 """
 
-import os
-from datetime import datetime, timedelta
+import time
+from datetime import timedelta
 from typing import Annotated, Optional
+import bcrypt
+from cachetools import TTLCache
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from passlib.context import CryptContext
-from sqlmodel import Session
-from dotenv import load_dotenv
+import jwt
+from sqlmodel import Session, select
 
+from config import get_settings
 from database import get_session, User
 
-load_dotenv()
-
 # --- Configuration ---
 # In production, strictly keep these secrets in .env and never commit them!
-SECRET_KEY = os.getenv("SECRET_KEY", "unsafe_secret_key_change_me")
-ALGORITHM = os.getenv("ALGORITHM", "HS256")
-ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
-
-# Password hashing context (Bcrypt)
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+_settings = get_settings()
+SECRET_KEY = _settings.secret_key
+# Pre-encoded key bytes: every sign/verify would otherwise re-encode the
+# string before OpenSSL can initialize the HMAC context.
+SECRET_KEY_BYTES = SECRET_KEY.encode("utf-8")
+ALGORITHM = _settings.algorithm
+ACCESS_TOKEN_EXPIRE_MINUTES = _settings.access_token_expire_minutes
+DEFAULT_EXP_SECONDS = ACCESS_TOKEN_EXPIRE_MINUTES * 60
+
+# Bcrypt work factor (cost). 12 is a sane default; tune via .env if needed.
+BCRYPT_ROUNDS = _settings.bcrypt_rounds
 
 # OAuth2 scheme: Tells FastAPI that the client sends a token in the Authorization header
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token", auto_error=False)
 
+# Precomputed hash verified against when a login targets an unknown email.
+# Running bcrypt on both branches keeps the response time identical and
+# prevents user enumeration via timing differences.
+DUMMY_HASH = bcrypt.hashpw(b"dummy-password-timing-guard", bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
+
+# Short-lived caches for the per-request auth hot path:
+#   token -> (email, exp)  skips the HMAC verify + JSON decode for
+#                          repeat requests; exp is re-checked on every
+#                          hit so a cached token still expires on time
+#   email -> user id       skips the email-index query in favour of a
+#                          PK lookup
+# TTLs are kept short so revocations still take effect quickly.
+_token_cache: TTLCache = TTLCache(maxsize=10_000, ttl=60)
+_user_id_cache: TTLCache = TTLCache(maxsize=10_000, ttl=30)
+
 
 # --- Utility Functions ---
 
@@ -50,8 +69,16 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
         
     Returns:
         bool: True if passwords match, False otherwise.
+
+    Notes:
+        Calls bcrypt's C implementation directly, avoiding the per-call
+        dispatch overhead of a generic hashing context.
     """
-    return pwd_context.verify(plain_password, hashed_password)
+    try:
+        return bcrypt.checkpw(plain_password.encode("utf-8"), hashed_password.encode("utf-8"))
+    except ValueError:
+        # Stored value is not a valid bcrypt hash
+        return False
 
 
 def get_password_hash(password: str) -> str:
@@ -66,8 +93,12 @@ def get_password_hash(password: str) -> str:
         
     Returns:
         str: The resulting hashed string.
+
+    Notes:
+        Produces the standard '$2b$' bcrypt format, so hashes created
+        previously through passlib continue to verify unchanged.
     """
-    return pwd_context.hash(password)
+    return bcrypt.hashpw(password.encode("utf-8"), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode("utf-8")
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -83,15 +114,15 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
         
     Returns:
         str: The encoded JWT string.
+
+    Notes:
+        'exp' is computed as POSIX-timestamp arithmetic — jwt.encode would
+        only convert an intermediate datetime back to one anyway.
     """
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+    expire_seconds = int(expires_delta.total_seconds()) if expires_delta else DEFAULT_EXP_SECONDS
+    to_encode["exp"] = int(time.time()) + expire_seconds
+    encoded_jwt = jwt.encode(to_encode, SECRET_KEY_BYTES, algorithm=ALGORITHM)
     return encoded_jwt
 
 
@@ -114,17 +145,38 @@ async def get_current_user(token: Annotated[str, Depends(oauth2_scheme)] = None,
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    try:
-        # Decode the token
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
+    # Check the token cache first to skip the HMAC verify on repeat
+    # requests. Expiry is enforced on hits too — the cache TTL alone
+    # would let an expired token keep authenticating for up to 60 s.
+    cached = _token_cache.get(token)
+    if cached is not None:
+        email, exp = cached
+        if time.time() >= exp:
+            _token_cache.pop(token, None)
             return None
-    except JWTError:
-        return None
-        
-    # Fetch user from DB
-    user = session.query(User).filter(User.email == email).first()
+    else:
+        try:
+            # Decode the token
+            payload = jwt.decode(token, SECRET_KEY_BYTES, algorithms=[ALGORITHM])
+            email = payload.get("sub")
+            if email is None:
+                return None
+        except jwt.InvalidTokenError:
+            return None
+        # Tokens without an exp claim never expire, matching jwt.decode
+        _token_cache[token] = (email, payload.get("exp", float("inf")))
+
+    # Fetch user from DB (PK lookup when the id is cached, email index otherwise)
+    user_id = _user_id_cache.get(email)
+    if user_id is not None:
+        user = session.get(User, user_id)
+        if user is not None:
+            return user
+
+    with session.no_autoflush:
+        user = session.exec(select(User).where(User.email == email)).first()
+    if user is not None:
+        _user_id_cache[email] = user.id
     return user
 
 async def get_current_active_user(current_user: Annotated[User, Depends(get_current_user)]) -> User:
@@ -0,0 +1,54 @@
+"""
+Central application settings.
+
+Loads the .env file exactly once at import time and exposes the values
+through a frozen Settings dataclass, so individual modules no longer
+call load_dotenv() themselves or re-coerce os.getenv strings on import.
+
+Dependencies:
+    - python-dotenv: For reading the .env file.
+"""
+
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from dotenv import load_dotenv
+
+# Walk the filesystem for .env once, here, instead of in every module.
+load_dotenv()
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Class: Settings
+
+    Description:
+        Immutable snapshot of environment-driven configuration, read once
+        at process start.
+    """
+    secret_key: str
+    algorithm: str
+    access_token_expire_minutes: int
+    bcrypt_rounds: int
+    database_url: str
+
+
+@lru_cache
+def get_settings() -> Settings:
+    """
+    Function: get_settings
+
+    Description:
+        Builds (once) and returns the process-wide Settings instance.
+
+    Returns:
+        Settings: The cached, frozen configuration object.
+    """
+    return Settings(
+        secret_key=os.getenv("SECRET_KEY", "unsafe_secret_key_change_me"),
+        algorithm=os.getenv("ALGORITHM", "HS256"),
+        access_token_expire_minutes=int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30)),
+        bcrypt_rounds=int(os.getenv("BCRYPT_ROUNDS", 12)),
+        database_url=os.getenv("DATABASE_URL", "sqlite:///./database.db"),
+    )
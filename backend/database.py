@@ -8,30 +8,47 @@ Dependencies:
     - sqlalchemy: Backend engine for SQLModel.
 """
 
-import os
 from datetime import datetime
 from typing import List, Optional
-from dotenv import load_dotenv
 from sqlmodel import Field, Relationship, SQLModel, create_engine, Session
 
-# Load environment variables from .env file
-load_dotenv()
+from config import get_settings
 
 # --- Configuration ---
-# Fetch database URL from environment or default to local SQLite file
-DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./database.db")
+# Fetch database URL from central settings (loads .env once) or default
+# to the local SQLite file
+DATABASE_URL = get_settings().database_url
 
-# Create the SQLAlchemy engine. 
+# Create the SQLAlchemy engine.
 # 'check_same_thread=False' is required for SQLite to work with FastAPI's async nature.
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# The pool is sized generously so concurrent requests don't queue on checkout.
+engine = create_engine(
+    DATABASE_URL,
+    connect_args={"check_same_thread": False},
+    pool_size=20,
+    max_overflow=40,
+    pool_timeout=30,
+    pool_pre_ping=True,
+    # Sized comfortably above the app's distinct statement count so
+    # compiled SQL is never evicted and recompiled.
+    query_cache_size=1200,
+)
 
-from sqlalchemy import event
+from sqlalchemy import event, Index
 
-# Enable Write-Ahead Logging (WAL) for concurrency
+# Tune every new SQLite connection for the read-heavy gallery workload:
+# WAL for concurrent readers/writer, relaxed fsync, in-memory temp tables,
+# memory-mapped I/O and a larger page cache.
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
     cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")   # 256 MiB
+    cursor.execute("PRAGMA cache_size=-20000")     # ~20 MB page cache
+    cursor.execute("PRAGMA foreign_keys=ON")
+    cursor.execute("PRAGMA busy_timeout=5000")
     cursor.close()
 
 
@@ -53,6 +70,12 @@ class ImageTagLink(SQLModel, table=True):
         source (str): The origin of the tag (e.g., 'manual', 'ai_clip', 'ai_ocr').
         is_verified (bool): Flag indicating if the tag was manually confirmed by an admin.
     """
+    # Supports the review queue: filter on is_verified plus a confidence
+    # range. Without it SQLite scans the whole link table per request.
+    __table_args__ = (
+        Index("ix_link_review", "is_verified", "confidence"),
+    )
+
     image_id: Optional[int] = Field(default=None, foreign_key="image.id", primary_key=True)
     tag_id: Optional[int] = Field(default=None, foreign_key="tag.id", primary_key=True)
     
@@ -133,6 +156,16 @@ class Image(SQLModel, table=True):
     Description:
         Represents a single photograph and its associated technical metadata.
     """
+    # Composite indexes covering the gallery hot path: filter on
+    # album/owner + is_deleted, then ORDER BY created_at DESC. Without
+    # them SQLite falls back to a table scan plus sort per page.
+    __table_args__ = (
+        Index("ix_image_album_deleted_created", "album_id", "is_deleted", "created_at"),
+        Index("ix_image_owner_deleted_created", "owner_id", "is_deleted", "created_at"),
+        # Range scans over recent uploads (dashboard history)
+        Index("ix_image_created", "created_at"),
+    )
+
     id: Optional[int] = Field(default=None, primary_key=True)
     album_id: int = Field(foreign_key="album.id")
     owner_id: Optional[int] = Field(default=None, foreign_key="user.id")
@@ -147,7 +180,7 @@ class Image(SQLModel, table=True):
     file_size: Optional[int] = None
     camera_model: Optional[str] = None
     
-    is_processed: bool = Field(default=False)
+    is_processed: bool = Field(default=False, index=True)
     is_deleted: bool = Field(default=False)
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -156,6 +189,27 @@ class Image(SQLModel, table=True):
     tags: List[Tag] = Relationship(back_populates="images", link_model=ImageTagLink)
 
 
+class HashCache(SQLModel, table=True):
+    """
+    Class: HashCache
+
+    Description:
+        Content-hash cache for ingest, keyed by file path and validated
+        against mtime/size. Lets re-scans of an unchanged library reuse
+        stored hashes instead of re-reading and re-hashing every file.
+
+    Attributes:
+        path (str): Absolute file path (primary key).
+        mtime_ns (int): st_mtime_ns at the time the hash was computed.
+        size (int): st_size at the time the hash was computed.
+        file_hash (str): The content hash for that (path, mtime, size).
+    """
+    path: str = Field(primary_key=True)
+    mtime_ns: int
+    size: int
+    file_hash: str
+
+
 # --- Utility Functions ---
 
 def create_db_and_tables():
@@ -193,8 +247,12 @@ def get_session():
         @app.get("/items")
         def read_items(session: Session = Depends(get_session)):
             ...
+
+    Notes:
+        expire_on_commit is disabled so objects stay usable after
+        commit() without triggering a re-SELECT per attribute access.
     """
-    with Session(engine) as session:
+    with Session(engine, expire_on_commit=False) as session:
         yield session
 
 
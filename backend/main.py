@@ -12,9 +12,13 @@ Global Variables:
     - app (FastAPI): The main application instance.
 """
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 from database import create_db_and_tables
 from routers import auth, scan, ai, gallery, upload, manage, review
@@ -40,16 +44,39 @@ async def lifespan(app: FastAPI):
         - Logic before 'yield' runs on startup.
         - Logic after 'yield' runs on shutdown.
         - Initializes the SQLite database tables on startup.
+        - Starts the persistent AI worker pool so model weights stay
+          resident between /ai/process triggers.
     """
     # Startup logic: Load configuration, connect to DB
     print("INFO:    Initializing database...")
     create_db_and_tables()
+
+    # Persistent single-worker pool for AI processing. The worker process
+    # survives across triggers, so the heavy CLIP/OCR models are loaded
+    # once instead of paying interpreter + model cold-start per request.
+    # Spawn (not fork): the worker must not inherit the parent's live
+    # SQLite connections (SQLite forbids carrying a connection across
+    # fork) nor the already-started logging listener thread.
+    app.state.ai_pool = ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    )
+
+    # Shared pool for bcrypt hashing: one worker per core so bulk
+    # registrations scale across CPUs in truly parallel native code.
+    # Spawn for the same reason as the AI pool above — forking this
+    # multi-threaded process would hand the children live SQLite pool
+    # state and running threads.
+    app.state.bcrypt_pool = ProcessPoolExecutor(
+        max_workers=os.cpu_count(), mp_context=multiprocessing.get_context("spawn")
+    )
     print("INFO:    Startup initiated. System is ready.")
-    
+
     yield
-    
+
     # Shutdown logic: Close DB connections, clear memory
     print("INFO:    Shutdown initiated. Cleaning up resources.")
+    app.state.ai_pool.shutdown(wait=False, cancel_futures=True)
+    app.state.bcrypt_pool.shutdown(wait=False, cancel_futures=True)
 
 
 # --- Application Initialization ---
@@ -57,7 +84,10 @@ app = FastAPI(
     title="AI Racing Gallery API",
     description="Backend API for AI-powered photo organization and semantic search.",
     version="0.1.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    # orjson encodes large tag-heavy gallery payloads several times faster
+    # than the stdlib json module used by the default JSONResponse.
+    default_response_class=ORJSONResponse
 )
 
 # --- Routers ---
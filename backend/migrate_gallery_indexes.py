@@ -0,0 +1,27 @@
+import sqlite3
+
+db_path = "backend/database.db"
+
+commands = [
+    "CREATE INDEX IF NOT EXISTS ix_image_album_deleted_created ON image (album_id, is_deleted, created_at);",
+    "CREATE INDEX IF NOT EXISTS ix_image_owner_deleted_created ON image (owner_id, is_deleted, created_at);",
+    "CREATE INDEX IF NOT EXISTS ix_image_is_processed ON image (is_processed);",
+    "CREATE INDEX IF NOT EXISTS ix_image_created ON image (created_at);"
+]
+
+try:
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    for cmd in commands:
+        try:
+            print(f"Executing: {cmd}")
+            cursor.execute(cmd)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}")
+
+    conn.commit()
+    conn.close()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
@@ -0,0 +1,24 @@
+import sqlite3
+
+db_path = "backend/database.db"
+
+commands = [
+    "CREATE INDEX IF NOT EXISTS ix_link_review ON imagetaglink (is_verified, confidence);"
+]
+
+try:
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    for cmd in commands:
+        try:
+            print(f"Executing: {cmd}")
+            cursor.execute(cmd)
+        except sqlite3.OperationalError as e:
+            print(f"Error: {e}")
+
+    conn.commit()
+    conn.close()
+    print("Migration successful.")
+except Exception as e:
+    print(f"Migration failed: {e}")
@@ -3,43 +3,41 @@ API endpoints for managing Artificial Intelligence tasks.
 Allows triggering the analysis of images that haven't been processed yet.
 """
 
-import sys
-import subprocess
-from fastapi import APIRouter, Depends
-from sqlmodel import Session, select
+from fastapi import APIRouter, Depends, Request
+from sqlmodel import Session, select, func
 from database import get_session, Image
 from auth import get_current_user, User
+# The shim keeps torch/transformers/easyocr out of the API process;
+# the worker imports the heavy module on first task.
+from workers.ai_task import run_ai_processing_task
 
 router = APIRouter(prefix="/ai", tags=["AI Intelligence"])
 
 @router.post("/process")
-async def trigger_ai_analysis(
+def trigger_ai_analysis(
+    request: Request,
     current_user: User = Depends(get_current_user),
     session: Session = Depends(get_session)
 ):
     """
     Endpoint: POST /ai/process
     Description:
-        Triggers the background AI worker process.
-        This spawns a completely separate system process to ensure
-        the main API remains responsive for other users.
+        Submits AI analysis to the persistent worker pool started in the
+        application lifespan. The worker process stays alive between
+        triggers, so model weights are loaded once and reused instead of
+        paying interpreter + model cold-start on every request.
     """
-    # Check if there is work to do
-    count = session.exec(select(Image).where(Image.is_processed == False)).all()
-    count = len(count)
-    
+    # Check if there is work to do (COUNT in SQL, no row hydration)
+    count = session.exec(select(func.count()).select_from(Image).where(Image.is_processed == False)).one()
+
     if count == 0:
         return {"message": "No new images to process."}
-    
-    # Spawn the worker process
-    # We use sys.executable to ensure we use the same Python interpreter (venv)
-    worker_script = "workers/ai_processor.py"
-    
+
     try:
-        subprocess.Popen([sys.executable, worker_script])
-        print(f"INFO: Spawned AI Worker process (Images to process: {count})")
+        request.app.state.ai_pool.submit(run_ai_processing_task)
+        print(f"INFO: Submitted AI batch to worker pool (Images to process: {count})")
     except Exception as e:
-        print(f"ERROR: Failed to spawn worker: {e}")
+        print(f"ERROR: Failed to submit AI batch: {e}")
         return {"message": "Failed to start AI worker.", "error": str(e)}
-    
-    return {"message": f"AI processing started for {count} images (Background Process)."}
\ No newline at end of file
+
+    return {"message": f"AI processing started for {count} images (Background Process)."}
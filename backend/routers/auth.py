@@ -2,14 +2,16 @@
 API endpoints related to authentication (login).
 """
 
+import asyncio
 from typing import Annotated
-from fastapi import APIRouter, Depends, HTTPException, status
+import anyio.to_thread
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlmodel import Session, select
 from pydantic import BaseModel, EmailStr
 
 from database import get_session, User
-from auth import verify_password, create_access_token, get_current_user, get_password_hash
+from auth import verify_password, create_access_token, get_current_user, get_password_hash, DUMMY_HASH
 
 router = APIRouter(tags=["Authentication"])
 
@@ -19,30 +21,38 @@ class UserCreate(BaseModel):
     full_name: str | None = None
 
 @router.post("/register", status_code=201)
-async def register_user(user_data: UserCreate, session: Session = Depends(get_session)):
+async def register_user(user_data: UserCreate, request: Request, session: Session = Depends(get_session)):
     """
     Endpoint: POST /register
     
     Description:
         Creates a new user account.
     """
-    # Check if email exists
-    existing_user = session.exec(select(User).where(User.email == user_data.email)).first()
-    if existing_user:
+    # Check if email exists (fetch only the id — no User instance needed)
+    existing_id = session.exec(select(User.id).where(User.email == user_data.email)).first()
+    if existing_id is not None:
         raise HTTPException(status_code=400, detail="Email already registered")
         
     # Create User
+    # Bcrypt is deliberately slow (CPU-bound KDF), so run it on the shared
+    # process pool (one worker per core) instead of blocking the event
+    # loop; bulk registrations then hash in parallel across CPUs.
+    loop = asyncio.get_running_loop()
+    hashed_password = await loop.run_in_executor(
+        request.app.state.bcrypt_pool, get_password_hash, user_data.password
+    )
     new_user = User(
         email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=hashed_password,
         full_name=user_data.full_name,
         role="guest" # Default role
     )
     
     session.add(new_user)
     session.commit()
-    session.refresh(new_user)
-    
+    # No refresh needed: the INSERT populates new_user.id and the session
+    # no longer expires attributes on commit.
+
     return {"message": "User created successfully", "user_id": new_user.id}
 
 @router.post("/token")
@@ -65,9 +75,17 @@ async def login_for_access_token(
         dict: JSON containing 'access_token' and 'token_type'.
     """
     # Note: OAuth2 form uses 'username' field, but we treat it as 'email'
-    user = session.query(User).filter(User.email == form_data.username).first()
-    
-    if not user or not verify_password(form_data.password, user.hashed_password):
+    with session.no_autoflush:
+        user = session.exec(select(User).where(User.email == form_data.username)).first()
+
+    # Offload the bcrypt verification to a worker thread so concurrent
+    # logins can overlap on multiple cores instead of serializing.
+    # Verify against DUMMY_HASH when the user doesn't exist, so the
+    # "unknown email" branch costs the same as a real password check
+    # (no timing oracle for user enumeration).
+    hashed = user.hashed_password if user else DUMMY_HASH
+    password_ok = await anyio.to_thread.run_sync(verify_password, form_data.password, hashed)
+    if not user or not password_ok:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
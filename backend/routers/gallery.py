@@ -6,10 +6,12 @@ Supports pagination and filtering by tags.
 from typing import List, Optional
 from datetime import datetime
 import os
+from urllib.parse import quote
+from cachetools import TTLCache
 from fastapi import APIRouter, Depends, Query, HTTPException
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, Response
 from sqlmodel import Session, select, col, func
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, load_only
 from pydantic import BaseModel
 
 from database import get_session, Image, Tag, Album, ImageTagLink, ImageRead
@@ -17,11 +19,24 @@ from auth import get_current_user, User
 
 router = APIRouter(prefix="/gallery", tags=["Gallery"])
 
+# When enabled (behind nginx), image bytes are served by the reverse proxy
+# via X-Accel-Redirect / sendfile(2) instead of streaming through Python.
+USE_X_ACCEL_REDIRECT = os.getenv("USE_X_ACCEL_REDIRECT", "0") == "1"
+DATA_DIR = os.path.abspath("data")
+
 class PaginatedImages(BaseModel):
     items: List[ImageRead]
     page: int
     limit: int
 
+# Only the columns ImageRead actually serializes — skips loading
+# owner_id/is_deleted bytes for every row on the hot list endpoint.
+_IMAGE_READ_COLUMNS = (
+    Image.id, Image.album_id, Image.filename, Image.path, Image.file_hash,
+    Image.captured_at, Image.width, Image.height, Image.file_size,
+    Image.camera_model, Image.is_processed, Image.created_at,
+)
+
 class AlbumReadWithStats(BaseModel):
     id: int
     name: str
@@ -29,24 +44,62 @@ class AlbumReadWithStats(BaseModel):
     photo_count: int
     cover_photo_hash: Optional[str] = None
 
+# Positive-only cache of "file exists on disk" results. Image files are
+# immutable once ingested, so a short TTL is plenty; misses (deleted or
+# never-ingested paths) are always re-checked.
+_file_exists_cache: TTLCache = TTLCache(maxsize=10_000, ttl=300)
+
+# Tag names are effectively immutable once created; cache name -> id so
+# tag filtering compares against an integer PK instead of joining the tag
+# table and matching a string per request. TTL bounds staleness for
+# freshly created tags.
+_tag_id_cache: TTLCache = TTLCache(maxsize=4096, ttl=60)
+
+def _resolve_tag_id(tag_name: str, session: Session) -> Optional[int]:
+    tag_id = _tag_id_cache.get(tag_name)
+    if tag_id is None:
+        tag_id = session.exec(select(Tag.id).where(Tag.name == tag_name)).first()
+        if tag_id is not None:
+            _tag_id_cache[tag_name] = tag_id
+    return tag_id
+
+def _file_exists(path: str) -> bool:
+    if _file_exists_cache.get(path):
+        return True
+    if os.path.exists(path):
+        _file_exists_cache[path] = True
+        return True
+    return False
+
 @router.get("/images/{image_id}/file")
-async def get_image_file(
+def get_image_file(
     image_id: int,
     session: Session = Depends(get_session),
-    # current_user: Optional[User] = Depends(get_current_user) 
+    # current_user: Optional[User] = Depends(get_current_user)
 ):
     image = session.exec(select(Image).where(Image.id == image_id)).first()
-    
+
     if not image:
         raise HTTPException(status_code=404, detail="Image not found")
-        
-    if not os.path.exists(image.path):
+
+    if not _file_exists(image.path):
         raise HTTPException(status_code=404, detail="File not found on disk")
-        
+
+    # Hand the actual byte transfer to nginx when available: auth stays
+    # here, nginx does kernel sendfile from its internal /_protected/
+    # location. Falls back to FileResponse for bare-uvicorn development.
+    if USE_X_ACCEL_REDIRECT:
+        relative_path = os.path.relpath(os.path.abspath(image.path), DATA_DIR)
+        if not relative_path.startswith(".."):
+            # Percent-encode: ingested files keep their original names,
+            # and non-ASCII would blow up the Latin-1 header encoding
+            # (and spaces would break nginx's internal URI lookup).
+            return Response(headers={"X-Accel-Redirect": quote(f"/_protected/{relative_path}")})
+
     return FileResponse(image.path)
 
 @router.get("/images", response_model=PaginatedImages)
-async def get_images(
+def get_images(
     page: int = 0,
     limit: int = 50,
     tag: Optional[str] = None,
@@ -57,8 +110,11 @@ async def get_images(
 ):
     offset = page * limit
     
-    query = select(Image).options(selectinload(Image.tags))
-    
+    query = select(Image).options(
+        load_only(*_IMAGE_READ_COLUMNS),
+        selectinload(Image.tags).load_only(Tag.id, Tag.name, Tag.category),
+    )
+
     if my_photos:
         if not current_user:
             raise HTTPException(status_code=401, detail="Authentication required to view your photos")
@@ -70,7 +126,11 @@ async def get_images(
     query = query.where(Image.is_deleted == False)
         
     if tag:
-        query = query.join(ImageTagLink).join(Tag).where(Tag.name == tag)
+        tag_id = _resolve_tag_id(tag, session)
+        if tag_id is None:
+            # Unknown tag name -> no matches, skip the query entirely
+            return {"items": [], "page": page, "limit": limit}
+        query = query.join(ImageTagLink, ImageTagLink.image_id == Image.id).where(ImageTagLink.tag_id == tag_id)
 
     query = query.order_by(col(Image.created_at).desc())
     
@@ -84,12 +144,20 @@ async def get_images(
 
 
 @router.get("/images/{image_id}", response_model=ImageRead)
-async def get_image_detail(
+def get_image_detail(
     image_id: int,
     session: Session = Depends(get_session),
     current_user: Optional[User] = Depends(get_current_user)
 ):
-    query = select(Image).where(Image.id == image_id).where(Image.is_deleted == False).options(selectinload(Image.tags))
+    query = (
+        select(Image)
+        .where(Image.id == image_id)
+        .where(Image.is_deleted == False)
+        .options(
+            load_only(*_IMAGE_READ_COLUMNS),
+            selectinload(Image.tags).load_only(Tag.id, Tag.name, Tag.category),
+        )
+    )
     image = session.exec(query).first()
     
     if not image:
@@ -99,30 +167,51 @@ async def get_image_detail(
 
 
 @router.get("/albums", response_model=List[AlbumReadWithStats])
-async def get_albums(
+def get_albums(
     session: Session = Depends(get_session),
     current_user: Optional[User] = Depends(get_current_user)
 ):
     """
     Endpoint: GET /gallery/albums
     Returns list of albums with photo count and cover image hash.
+
+    Notes:
+        Counts and cover hashes are resolved in a single grouped query
+        (LEFT JOIN + correlated subquery for the cover) instead of two
+        extra queries per album, so the SQL roundtrip count stays O(1)
+        regardless of how many albums exist.
     """
-    albums = session.exec(select(Album).where(Album.is_deleted == False).order_by(Album.created_at.desc())).all()
-    
-    results = []
-    for album in albums:
-        # Get count
-        count = session.exec(select(func.count(Image.id)).where(Image.album_id == album.id).where(Image.is_deleted == False)).first()
-        
-        # Get cover (last uploaded image)
-        cover = session.exec(select(Image).where(Image.album_id == album.id).where(Image.is_deleted == False).order_by(Image.created_at.desc()).limit(1)).first()
-        
-        results.append({
-            "id": album.id,
-            "name": album.name,
-            "created_at": album.created_at,
-            "photo_count": count or 0,
-            "cover_photo_hash": cover.file_hash if cover else None
-        })
-        
-    return results
\ No newline at end of file
+    # Correlated subquery: hash of the most recently added live image per album
+    cover_subquery = (
+        select(Image.file_hash)
+        .where(Image.album_id == Album.id)
+        .where(Image.is_deleted == False)
+        .order_by(col(Image.created_at).desc())
+        .limit(1)
+        .scalar_subquery()
+    )
+
+    rows = session.exec(
+        select(
+            Album.id,
+            Album.name,
+            Album.created_at,
+            func.count(Image.id),
+            cover_subquery.label("cover_photo_hash"),
+        )
+        .join(Image, (Image.album_id == Album.id) & (Image.is_deleted == False), isouter=True)
+        .where(Album.is_deleted == False)
+        .group_by(Album.id)
+        .order_by(col(Album.created_at).desc())
+    ).all()
+
+    return [
+        {
+            "id": album_id,
+            "name": name,
+            "created_at": created_at,
+            "photo_count": photo_count or 0,
+            "cover_photo_hash": cover_hash,
+        }
+        for album_id, name, created_at, photo_count, cover_hash in rows
+    ]
\ No newline at end of file
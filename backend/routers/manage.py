@@ -1,30 +1,53 @@
+import time
+from datetime import datetime, timedelta
 from typing import List, Dict, Any
 from fastapi import APIRouter, Depends, HTTPException, Body
 from sqlmodel import Session, select, col, func, desc
+from sqlalchemy import update as sa_update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 import yaml
 import os
 
 from database import get_session, Image, Album, Tag, ImageTagLink
 from auth import get_current_user, User
+from utils.yaml_cache import load_yaml_cached
 
 router = APIRouter(prefix="/manage", tags=["Management"])
 
 CONFIG_PATH = "config.yaml"
 
 def get_directory_size(path: str) -> int:
-    """Recursively calculate directory size in bytes."""
+    """
+    Recursively calculate directory size in bytes.
+
+    Uses an iterative os.scandir walk: DirEntry.is_dir/is_symlink reuse
+    the file type returned by readdir and stat(follow_symlinks=False)
+    hits the cached entry, so each file costs at most one syscall instead
+    of the 2-3 that os.walk + getsize + islink incur.
+    """
     total_size = 0
-    if not os.path.exists(path):
-        return 0
-    for dirpath, dirnames, filenames in os.walk(path):
-        for f in filenames:
-            fp = os.path.join(dirpath, f)
-            if not os.path.islink(fp):
-                total_size += os.path.getsize(fp)
+    stack = [path]
+    while stack:
+        current = stack.pop()
+        try:
+            entries = os.scandir(current)
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                try:
+                    if entry.is_symlink():
+                        continue
+                    if entry.is_dir(follow_symlinks=False):
+                        stack.append(entry.path)
+                    else:
+                        total_size += entry.stat(follow_symlinks=False).st_size
+                except OSError:
+                    continue
     return total_size
 
 @router.get("/readme")
-async def get_readme():
+def get_readme():
     """
     Endpoint: GET /manage/readme
     Returns the content of README.md.
@@ -48,36 +71,63 @@ async def get_readme():
     return {"content": content}
 
 # --- Stats Endpoint ---
+
+# Dashboards poll /manage/stats, but the numbers only change on the order
+# of seconds. Counts/history are cached for a short TTL; the recursive
+# directory scan (the dominant cost) gets its own, longer slot.
+_STATS_TTL = 15
+_STORAGE_TTL = 60
+_stats_cache = {"ts": 0.0, "data": None}
+_storage_cache = {"ts": 0.0, "bytes": 0}
+
+def _get_storage_bytes() -> int:
+    now = time.monotonic()
+    if now - _storage_cache["ts"] > _STORAGE_TTL:
+        data_dir_size = get_directory_size("data")
+        db_size = os.path.getsize("database.db") if os.path.exists("database.db") else 0
+        _storage_cache["bytes"] = data_dir_size + db_size
+        _storage_cache["ts"] = now
+    return _storage_cache["bytes"]
+
 @router.get("/stats")
-async def get_stats(
+def get_stats(
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
 ):
     """
     Endpoint: GET /manage/stats
     Description: Returns high-level statistics for the dashboard.
+                 Results are cached in-process for a few seconds to
+                 amortize the aggregate queries and directory scan
+                 across dashboard polls.
     """
+    now = time.monotonic()
+    if _stats_cache["data"] is not None and now - _stats_cache["ts"] < _STATS_TTL:
+        return _stats_cache["data"]
+
     # 1. Basic Counts
     total_images = session.exec(select(func.count(Image.id)).where(Image.is_deleted == False)).first() or 0
     total_albums = session.exec(select(func.count(Album.id)).where(Album.is_deleted == False)).first() or 0
     total_tags = session.exec(select(func.count(Tag.id))).first() or 0
     pending_ai = session.exec(select(func.count(Image.id)).where(Image.is_processed == False).where(Image.is_deleted == False)).first() or 0
     
-    # 2. Storage Usage (Real - App Only)
-    data_dir_size = get_directory_size("data")
-    db_size = os.path.getsize("database.db") if os.path.exists("database.db") else 0
-    total_storage_bytes = data_dir_size + db_size
+    # 2. Storage Usage (Real - App Only, cached on its own TTL)
+    total_storage_bytes = _get_storage_bytes()
     
     # 3. Upload History (Last 14 days)
+    # The range filter on created_at rides ix_image_created, so SQLite
+    # does an index range scan over the last two weeks instead of running
+    # strftime over every row in the table.
+    cutoff = datetime.utcnow() - timedelta(days=14)
     history_query = (
-        select(func.strftime('%Y-%m-%d', Image.created_at).label('date'), func.count(Image.id))
+        select(func.date(Image.created_at).label('date'), func.count(Image.id))
         .where(Image.is_deleted == False)
-        .group_by(func.strftime('%Y-%m-%d', Image.created_at))
-        .order_by(desc('date'))
-        .limit(14)
+        .where(Image.created_at >= cutoff)
+        .group_by(func.date(Image.created_at))
+        .order_by('date')
     )
     history_results = session.exec(history_query).all()
-    history_data = [{"date": r[0], "count": r[1]} for r in history_results][::-1]
+    history_data = [{"date": r[0], "count": r[1]} for r in history_results]
 
     # 4. Top Tags
     tags_query = (
@@ -91,35 +141,40 @@ async def get_stats(
     colors = ["indigo", "violet", "grape", "pink", "red", "orange"]
     top_tags = [{"name": r[0], "value": r[1], "color": colors[i % len(colors)]} for i, r in enumerate(tags_results)]
 
-    return {
+    result = {
         "total_images": total_images,
         "total_albums": total_albums,
         "total_tags": total_tags,
         "pending_ai": pending_ai,
         "storage": {
             "used_bytes": total_storage_bytes,
-            "formatted": f"{total_storage_bytes / (1024*1024):.2f} MB" 
+            "formatted": f"{total_storage_bytes / (1024*1024):.2f} MB"
         },
         "history": history_data,
         "top_tags": top_tags
     }
 
+    _stats_cache["data"] = result
+    _stats_cache["ts"] = now
+    return result
+
 # --- Config Management ---
 
 @router.get("/config")
-async def get_config(
+def get_config(
     current_user: User = Depends(get_current_user)
 ):
     if not os.path.exists(CONFIG_PATH):
         raise HTTPException(status_code=404, detail="Config file not found")
     try:
-        with open(CONFIG_PATH, "r") as f:
-            return yaml.safe_load(f)
+        # mtime-validated cache: re-parses only when the file changed.
+        # Deep-copied result, so response serialization can't touch the cache.
+        return load_yaml_cached(CONFIG_PATH)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse config: {e}")
 
 @router.post("/config")
-async def update_config(
+def update_config(
     new_config: Dict[str, Any] = Body(...),
     current_user: User = Depends(get_current_user)
 ):
@@ -140,7 +195,7 @@ async def update_config(
 # --- Image Management & Tags ---
 
 @router.post("/images/delete")
-async def delete_images_batch(
+def delete_images_batch(
     image_ids: List[int] = Body(...),
     session: Session = Depends(get_session),
     current_user: User = Depends(get_current_user)
@@ -150,21 +205,16 @@ async def delete_images_batch(
 
     if not image_ids: return {"processed": 0}
 
-    statement = select(Image).where(col(Image.id).in_(image_ids))
-    images_to_delete = session.exec(statement).all()
-    
-    deleted_count = 0
-    for img in images_to_delete:
-        img.is_deleted = True
-        session.add(img)
-        deleted_count += 1
-        
+    # Single bulk UPDATE — no per-row ORM loads or identity-map tracking
+    result = session.exec(
+        sa_update(Image).where(col(Image.id).in_(image_ids)).values(is_deleted=True)
+    )
     session.commit()
-    return {"message": "Batch delete successful", "deleted": deleted_count}
+    return {"message": "Batch delete successful", "deleted": result.rowcount}
 
 
 @router.post("/images/{image_id}/tags")
-async def add_image_tag(
+def add_image_tag(
     image_id: int,
     tag_name: str = Body(..., embed=True),
     session: Session = Depends(get_session),
@@ -179,33 +229,31 @@ async def add_image_tag(
     img = session.get(Image, image_id)
     if not img:
         raise HTTPException(status_code=404, detail="Image not found")
-        
-    # Find or Create Tag
-    tag = session.exec(select(Tag).where(Tag.name == tag_name)).first()
-    if not tag:
-        tag = Tag(name=tag_name, category="manual")
-        session.add(tag)
-        session.commit()
-        session.refresh(tag)
-        
-    # Create Link if not exists
-    link = session.exec(select(ImageTagLink).where(ImageTagLink.image_id==img.id, ImageTagLink.tag_id==tag.id)).first()
-    if not link:
-        link = ImageTagLink(
-            image_id=img.id, 
-            tag_id=tag.id, 
-            source="manual", 
-            confidence=1.0, 
-            is_verified=True
-        )
-        session.add(link)
-        session.commit()
-        
+
+    # Upsert Tag: the no-op DO UPDATE makes RETURNING yield the id whether
+    # the row is new or already existed — one statement instead of
+    # SELECT + conditional INSERT + refresh.
+    tag_id = session.exec(
+        sqlite_insert(Tag)
+        .values(name=tag_name, category="manual")
+        .on_conflict_do_update(index_elements=["name"], set_={"name": tag_name})
+        .returning(Tag.id)
+    ).scalar_one()
+
+    # Upsert Link: silently keep an existing link instead of SELECT-then-INSERT
+    session.exec(
+        sqlite_insert(ImageTagLink)
+        .values(image_id=img.id, tag_id=tag_id, source="manual", confidence=1.0, is_verified=True)
+        .on_conflict_do_nothing(index_elements=["image_id", "tag_id"])
+    )
+    session.commit()
+
+    tag = session.get(Tag, tag_id)
     return {"status": "success", "tag": tag}
 
 
 @router.delete("/images/{image_id}/tags/{tag_id}")
-async def remove_image_tag(
+def remove_image_tag(
     image_id: int,
     tag_id: int,
     session: Session = Depends(get_session),
@@ -224,7 +272,7 @@ async def remove_image_tag(
 
 
 @router.post("/albums/{album_id}/delete")
-async def delete_album(
+def delete_album(
     album_id: int,
     cascade: bool = False,
     session: Session = Depends(get_session),
@@ -242,11 +290,11 @@ async def delete_album(
     
     images_count = 0
     if cascade:
-        images = session.exec(select(Image).where(Image.album_id == album_id)).all()
-        for img in images:
-            img.is_deleted = True
-            session.add(img)
-        images_count = len(images)
-        
+        # Bulk UPDATE instead of loading every image row just to flip a flag
+        result = session.exec(
+            sa_update(Image).where(Image.album_id == album_id).values(is_deleted=True)
+        )
+        images_count = result.rowcount
+
     session.commit()
     return {"message": f"Album '{album.name}' deleted.", "images_deleted": images_count}
\ No newline at end of file
@@ -17,7 +17,7 @@ class ScanRequest(BaseModel):
     path: str
 
 @router.post("/")
-async def trigger_scan(
+def trigger_scan(
     request: ScanRequest, 
     background_tasks: BackgroundTasks,
     current_user: User = Depends(get_current_user),
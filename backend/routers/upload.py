@@ -10,16 +10,28 @@ import hashlib
 import zipfile
 import uuid
 import io
-from typing import List
+import concurrent.futures
+from typing import List, Tuple
 from datetime import datetime
 from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, BackgroundTasks
-from sqlmodel import Session, select
+from sqlmodel import Session, select, col
 from PIL import Image as PILImage
 
 from database import get_session, Image, Album
 from auth import get_current_user, User
 from services.ingest import process_import
 
+# Optional fast path: libvips decodes once and produces both the WebP
+# original and the thumbnail through a demand-driven SIMD pipeline,
+# several times faster than the PIL decode -> encode -> thumbnail chain.
+# Falls back to PIL when the native library isn't installed.
+try:
+    import pyvips
+    _HAS_PYVIPS = True
+except ImportError:
+    pyvips = None
+    _HAS_PYVIPS = False
+
 router = APIRouter(prefix="/upload", tags=["Upload"])
 
 # --- Supported Extensions ---
@@ -38,7 +50,7 @@ os.makedirs(IMPORT_DIR, exist_ok=True)
 # --- BATCH UPLOAD (For Import/Ingest) ---
 
 @router.post("/batch")
-async def upload_batch(
+def upload_batch(
     files: List[UploadFile] = File(...),
     background_tasks: BackgroundTasks = None,
     current_user: User = Depends(get_current_user)
@@ -88,9 +100,75 @@ async def upload_batch(
 
 # --- SINGLE / DIRECT UPLOAD (Legacy / Profile Pics) ---
 
-def process_uploaded_image(file_content: bytes, filename: str, session: Session, owner_id: int):
+# How many prepared images are flushed per commit. Each commit is an
+# fsync on SQLite, so committing per image turns a 500-file ZIP into 500
+# fsyncs; one commit per batch amortizes that away.
+DB_BATCH_SIZE = 100
+
+def _sha256_file(path: str) -> str:
     """
-    Helper function to process a single uploaded image content.
+    SHA-256 of a file on disk. hashlib is OpenSSL-backed, so on modern
+    CPUs this runs on the SHA-NI instructions; file_digest (Python 3.11+)
+    additionally avoids the Python-level chunk loop.
+    """
+    with open(path, "rb", buffering=0) as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        h = hashlib.sha256()
+        while chunk := f.read(1 << 20):
+            h.update(chunk)
+        return h.hexdigest()
+
+
+def _parse_exif_timestamp(date_str: str):
+    """Slice-parses the fixed 'YYYY:MM:DD HH:MM:SS' EXIF layout."""
+    return datetime(
+        int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]),
+        int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19])
+    )
+
+
+def _prepare_with_vips(file_content: bytes, filename: str, file_hash: str):
+    """libvips variant of prepare_uploaded_image: one decode, two outputs."""
+    img = pyvips.Image.new_from_buffer(file_content, "")
+    webp_content = img.webpsave_buffer(Q=90)
+
+    # thumbnail_buffer re-reads the source with a shrink-on-load hint,
+    # so e.g. JPEGs are decoded directly at reduced resolution
+    thumb = pyvips.Image.thumbnail_buffer(file_content, 400, height=400, size="down")
+    thumb_bytes = thumb.jpegsave_buffer(Q=80)
+
+    captured_at = None
+    for field in ("exif-ifd2-DateTimeOriginal", "exif-ifd0-DateTime"):
+        try:
+            captured_at = _parse_exif_timestamp(img.get(field))
+            break
+        except Exception:
+            continue
+
+    return {
+        "filename": filename,
+        "file_hash": file_hash,
+        "webp": webp_content,
+        "thumb": thumb_bytes,
+        "width": img.width,
+        "height": img.height,
+        "captured_at": captured_at,
+    }
+
+
+def prepare_uploaded_image(file_content: bytes, filename: str, file_hash: str = None):
+    """
+    CPU-only half of upload processing: decodes, converts to WebP and
+    renders the thumbnail entirely in memory. Touches neither the disk
+    nor the database, so results can be deduplicated and flushed in bulk.
+
+    The dedup key is the SHA-256 of the *source* bytes (passed in by
+    callers that have already checked it, or computed here), so callers
+    can detect duplicates before paying for any decode/encode work.
+
+    Uses the libvips pipeline when available, PIL otherwise.
+    Returns a dict of prepared data, or None for unsupported/broken files.
     """
     try:
         # Check extension before heavy processing
@@ -98,123 +176,296 @@ def process_uploaded_image(file_content: bytes, filename: str, session: Session,
         if ext.lower() not in IMAGE_EXTENSIONS:
             return None
 
+        if file_hash is None:
+            file_hash = hashlib.sha256(file_content).hexdigest()
+
+        if _HAS_PYVIPS:
+            try:
+                return _prepare_with_vips(file_content, filename, file_hash)
+            except Exception as e:
+                print(f"WARNING: pyvips failed for {filename}, falling back to PIL: {e}")
+
         # 1. Load Image
         img = PILImage.open(io.BytesIO(file_content))
-        
+
         # 2. Convert to WebP (In-Memory)
         output_buffer = io.BytesIO()
         if img.mode in ("RGBA", "LA"):
-            pass 
+            pass
         elif img.mode == "P":
             img = img.convert("RGBA")
         else:
             img = img.convert("RGB")
-            
+
         img.save(output_buffer, format="WEBP", quality=90)
         webp_content = output_buffer.getvalue()
-        
-        # 3. Calculate Hash
-        file_hash = hashlib.sha256(webp_content).hexdigest()
-        
-        # Check Duplicate
-        existing = session.exec(select(Image).where(Image.file_hash == file_hash)).first()
-        if existing:
-            return {"status": "skipped", "reason": "duplicate", "filename": filename}
-            
-        # 4. Save to Disk
-        save_filename = f"{file_hash}.webp"
-        save_path = os.path.join(UPLOAD_DIR, save_filename)
-        
-        with open(save_path, "wb") as f:
-            f.write(webp_content)
-            
-        # 5. Generate Thumbnail
-        thumb_filename = f"{file_hash}.jpg"
-        thumb_path = os.path.join(THUMBNAIL_DIR, thumb_filename)
-        img.thumbnail((400, 400), PILImage.Resampling.LANCZOS)
-        img.convert("RGB").save(thumb_path, "JPEG", quality=80)
-        
-        # 6. Metadata
+
+        # 3. Metadata (before thumbnail() shrinks the image in place)
+        # Fetch just the two timestamp tags instead of decoding the whole
+        # EXIF block into a name dict, and slice-parse the fixed
+        # 'YYYY:MM:DD HH:MM:SS' layout rather than paying for strptime.
         width, height = img.size
         captured_at = None
         try:
-            exif = img._getexif()
-            if exif:
-                from PIL.ExifTags import TAGS
-                decoded = {TAGS.get(k, k): v for k, v in exif.items()}
-                date_str = decoded.get("DateTimeOriginal") or decoded.get("DateTime")
-                if date_str:
-                    captured_at = datetime.strptime(date_str, "%Y:%m:%d %H:%M:%S")
-        except:
+            exif = img.getexif()
+            date_str = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)  # DateTimeOriginal / DateTime
+            if date_str:
+                captured_at = _parse_exif_timestamp(date_str)
+        except Exception:
             pass
-            
-        # 7. Album
-        album = session.exec(select(Album).where(Album.slug == "web-uploads")).first()
-        if not album:
-            album = Album(name="Web Uploads", slug="web-uploads", root_path=UPLOAD_DIR, owner_id=owner_id)
-            session.add(album)
-            session.commit()
-            session.refresh(album)
-
-        # 8. DB Record
-        new_image = Image(
-            album_id=album.id,
+
+        # 4. Thumbnail (In-Memory)
+        thumb_buffer = io.BytesIO()
+        img.thumbnail((400, 400), PILImage.Resampling.LANCZOS)
+        img.convert("RGB").save(thumb_buffer, "JPEG", quality=80)
+
+        return {
+            "filename": filename,
+            "file_hash": file_hash,
+            "webp": webp_content,
+            "thumb": thumb_buffer.getvalue(),
+            "width": width,
+            "height": height,
+            "captured_at": captured_at,
+        }
+
+    except Exception as e:
+        print(f"Error processing {filename}: {e}")
+        return None
+
+
+def _write_prepared_files(prepared: dict) -> None:
+    """Writes the WebP original and JPEG thumbnail for one prepared image."""
+    save_path = os.path.join(UPLOAD_DIR, f"{prepared['file_hash']}.webp")
+    with open(save_path, "wb") as f:
+        f.write(prepared["webp"])
+    thumb_path = os.path.join(THUMBNAIL_DIR, f"{prepared['file_hash']}.jpg")
+    with open(thumb_path, "wb") as f:
+        f.write(prepared["thumb"])
+    prepared["path"] = save_path
+
+
+def _get_web_uploads_album(session: Session, owner_id: int) -> Album:
+    """Fetches (or creates, once) the album that direct uploads land in."""
+    album = session.exec(select(Album).where(Album.slug == "web-uploads")).first()
+    if not album:
+        album = Album(name="Web Uploads", slug="web-uploads", root_path=UPLOAD_DIR, owner_id=owner_id)
+        session.add(album)
+        session.commit()
+    return album
+
+
+def flush_prepared_images(prepared_batch: List[dict], session: Session, album_id: int, owner_id: int) -> int:
+    """
+    Deduplicates a batch of prepared images against the DB in one
+    IN-query, writes the surviving files in parallel, and inserts all
+    Image rows with a single commit. Returns the number of rows added.
+    """
+    if not prepared_batch:
+        return 0
+
+    # One query for all hashes in the batch instead of a SELECT per image
+    hashes = [p["file_hash"] for p in prepared_batch]
+    existing = set(session.exec(select(Image.file_hash).where(col(Image.file_hash).in_(hashes))).all())
+
+    kept = []
+    for p in prepared_batch:
+        if p["file_hash"] in existing:
+            print(f"DEBUG: Skipping duplicate {p['filename']}")
+            continue
+        existing.add(p["file_hash"])  # also dedup within the batch itself
+        kept.append(p)
+
+    if not kept:
+        return 0
+
+    # File writes are I/O bound — overlap them
+    with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(_write_prepared_files, kept))
+
+    session.add_all([
+        Image(
+            album_id=album_id,
             owner_id=owner_id,
-            filename=filename,
-            path=save_path,
-            file_hash=file_hash,
-            captured_at=captured_at,
-            width=width,
-            height=height,
-            file_size=len(webp_content),
+            filename=p["filename"],
+            path=p["path"],
+            file_hash=p["file_hash"],
+            captured_at=p["captured_at"],
+            width=p["width"],
+            height=p["height"],
+            file_size=len(p["webp"]),
             is_processed=False
         )
-        session.add(new_image)
-        session.commit()
-        
-        return {"status": "success", "id": new_image.id, "filename": filename}
-        
-    except Exception as e:
-        print(f"Error processing {filename}: {e}")
-        return {"status": "error", "reason": str(e), "filename": filename}
+        for p in kept
+    ])
+    session.commit()
+    return len(kept)
+
+
+def _process_saved_uploads(saved_files: List[Tuple[str, str]], owner_id: int):
+    """
+    Background task: processes files already streamed to the temp import
+    directory, with its own DB session so no pool slot is held for the
+    duration of the upload request itself.
+
+    saved_files carries (temp path, original filename) pairs — temp names
+    are made unique per batch, so the original name travels separately.
+    """
+    from database import engine
+
+    with Session(engine) as session:
+        # Album resolved once for the whole batch, not once per image
+        album = _get_web_uploads_album(session, owner_id)
+
+        prepared_batch: List[dict] = []
+        seen_hashes = set()
+
+        # Pre-hash the plain image files in parallel (hashlib releases
+        # the GIL, so threads use multiple cores) and resolve all their
+        # duplicates with a single IN query instead of a SELECT per file.
+        plain_paths = [p for p, _ in saved_files if not p.lower().endswith(".zip")]
+        path_hashes = {}
+        if plain_paths:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(4, len(plain_paths))) as executor:
+                for path, digest in zip(plain_paths, executor.map(_sha256_file, plain_paths)):
+                    path_hashes[path] = digest
+            seen_hashes.update(
+                session.exec(
+                    select(Image.file_hash).where(col(Image.file_hash).in_(set(path_hashes.values())))
+                ).all()
+            )
+
+        def _add(prepared):
+            if prepared is None:
+                return
+            prepared_batch.append(prepared)
+            if len(prepared_batch) >= DB_BATCH_SIZE:
+                flush_prepared_images(prepared_batch, session, album.id, owner_id)
+                prepared_batch.clear()
+
+        def _ingest(content, name, src_hash=None):
+            # Hash the raw source bytes first: a duplicate then costs one
+            # SHA-256 + one indexed SELECT instead of a full decode,
+            # WebP encode and thumbnail render.
+            if src_hash is None:
+                src_hash = hashlib.sha256(content).hexdigest()
+                if src_hash in seen_hashes:
+                    return
+                if session.exec(select(Image.id).where(Image.file_hash == src_hash)).first() is not None:
+                    print(f"DEBUG: Skipping duplicate {name} (pre-encode)")
+                    return
+            seen_hashes.add(src_hash)
+            _add(prepare_uploaded_image(content, name, src_hash))
+
+        for saved_path, filename in saved_files:
+            try:
+                # Handle ZIP files: stream entries one at a time, never the
+                # whole archive into memory
+                if filename.lower().endswith('.zip'):
+                    print(f"INFO: Extracting ZIP: {filename}")
+                    try:
+                        with zipfile.ZipFile(saved_path) as z:
+                            for z_info in z.infolist():
+                                # Skip directories
+                                if z_info.is_dir():
+                                    continue
+
+                                # Process only images inside ZIP
+                                ext = os.path.splitext(z_info.filename)[1].lower()
+                                if ext not in IMAGE_EXTENSIONS:
+                                    continue
+
+                                # First pass: hash the entry in 64 KiB
+                                # chunks straight off the decompressor, so
+                                # duplicates are detected with flat memory
+                                # and never materialized at all. Only new
+                                # entries pay a second decompress to get
+                                # the actual bytes.
+                                h = hashlib.sha256()
+                                with z.open(z_info) as entry:
+                                    while chunk := entry.read(1 << 16):
+                                        h.update(chunk)
+                                src_hash = h.hexdigest()
+
+                                if src_hash in seen_hashes:
+                                    continue
+                                if session.exec(select(Image.id).where(Image.file_hash == src_hash)).first() is not None:
+                                    print(f"DEBUG: Skipping duplicate {z_info.filename} (pre-encode)")
+                                    continue
 
+                                with z.open(z_info) as entry:
+                                    z_content = entry.read()
+                                _ingest(z_content, z_info.filename, src_hash)
+                    except Exception as e:
+                        print(f"ERROR: ZIP corruption in {filename}: {e}")
+                else:
+                    # Handle regular image; its hash was precomputed above,
+                    # so duplicates are skipped without even reading the file
+                    src_hash = path_hashes[saved_path]
+                    if src_hash in seen_hashes:
+                        print(f"DEBUG: Skipping duplicate {filename} (pre-encode)")
+                        continue
+                    with open(saved_path, "rb") as f:
+                        content = f.read()
+                    _ingest(content, filename, src_hash)
+            finally:
+                try:
+                    os.remove(saved_path)
+                except OSError:
+                    pass
 
-@router.post("/")
-async def upload_images(
+        # Final partial batch
+        flush_prepared_images(prepared_batch, session, album.id, owner_id)
+
+    # Remove the (now empty) temp batch directory
+    if saved_files:
+        try:
+            os.rmdir(os.path.dirname(saved_files[0][0]))
+        except OSError:
+            pass
+
+
+# Plain def: the handler does blocking copyfileobj writes, so Starlette
+# must run it on the threadpool instead of the event loop.
+@router.post("/", status_code=202)
+def upload_images(
     files: List[UploadFile] = File(...),
-    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks = None,
     current_user: User = Depends(get_current_user)
 ):
     """
     Endpoint: POST /upload/
     Accepts images and ZIP files.
+
+    Files are streamed straight to a temp directory (constant memory,
+    regardless of upload size) and conversion/ingestion runs as a
+    background task, so the request returns as soon as the bytes are on
+    disk.
     """
-    results = []
-    for file in files:
-        filename = file.filename
-        content = await file.read()
-        
-        # Handle ZIP files
-        if filename.lower().endswith('.zip'):
-            print(f"INFO: Extracting ZIP: {filename}")
-            try:
-                with zipfile.ZipFile(io.BytesIO(content)) as z:
-                    for z_info in z.infolist():
-                        # Skip directories
-                        if z_info.is_dir():
-                            continue
-                        
-                        # Process only images inside ZIP
-                        ext = os.path.splitext(z_info.filename)[1].lower()
-                        if ext in IMAGE_EXTENSIONS:
-                            z_content = z.read(z_info.filename)
-                            res = process_uploaded_image(z_content, z_info.filename, session, current_user.id)
-                            if res: results.append(res)
-            except Exception as e:
-                results.append({"status": "error", "reason": f"ZIP corruption: {e}", "filename": filename})
-        else:
-            # Handle regular image
-            res = process_uploaded_image(content, filename, session, current_user.id)
-            if res: results.append(res)
-        
-    return {"processed": len(results), "details": results}
\ No newline at end of file
+    batch_id = datetime.now().strftime("%Y%m%d_%H%M%S") + "_" + str(uuid.uuid4())[:8]
+    tmp_dir = os.path.join(IMPORT_DIR, f"direct_{batch_id}")
+    os.makedirs(tmp_dir, exist_ok=True)
+
+    saved_files: List[Tuple[str, str]] = []
+    for idx, file in enumerate(files):
+        try:
+            filename = os.path.basename(file.filename)
+            # Index prefix keeps same-named files from different folders
+            # from overwriting each other in the shared temp directory;
+            # the original name is carried alongside the path.
+            tmp_path = os.path.join(tmp_dir, f"{idx:04d}_{filename}")
+            # Efficiently stream file to disk
+            with open(tmp_path, "wb") as buffer:
+                shutil.copyfileobj(file.file, buffer)
+            saved_files.append((tmp_path, filename))
+        except Exception as e:
+            print(f"ERROR: Failed to save uploaded file {file.filename}: {e}")
+
+    if background_tasks and saved_files:
+        background_tasks.add_task(_process_saved_uploads, saved_files, current_user.id)
+
+    return {
+        "message": f"Uploaded {len(saved_files)} files. Processing started in background.",
+        "batch_id": batch_id,
+        "queued": len(saved_files)
+    }
\ No newline at end of file
@@ -8,11 +8,54 @@ Dependencies:
 """
 
 import hashlib
+import io
+import mmap
 import os
 from datetime import datetime
 from typing import Optional, Dict, Any
-from PIL import Image, ExifTags
-from PIL.ExifTags import TAGS
+from PIL import Image
+
+from utils.log import get_logger
+
+logger = get_logger("image_processor")
+
+# Optional SIMD resampler: libvips' thumbnail path decodes at reduced
+# resolution where the format allows and resamples with vectorized
+# kernels, typically several times faster than Pillow's scalar LANCZOS.
+# Same soft dependency as the upload pipeline; PIL remains the fallback.
+try:
+    import pyvips
+    _HAS_PYVIPS = True
+except ImportError:
+    pyvips = None
+    _HAS_PYVIPS = False
+
+# Optional fast fingerprint: BLAKE3's SIMD tree hash runs at several
+# GB/s single-core, well above even SHA-NI SHA-256. Duplicate detection
+# only needs a stable content fingerprint, but existing rows store
+# SHA-256 digests, so BLAKE3 is opt-in (USE_BLAKE3=1) for libraries
+# ingested from scratch; don't flip it on an already-populated database.
+try:
+    from blake3 import blake3
+    _HAS_BLAKE3 = True
+except ImportError:
+    blake3 = None
+    _HAS_BLAKE3 = False
+
+_USE_BLAKE3 = _HAS_BLAKE3 and os.environ.get("USE_BLAKE3", "0") == "1"
+
+# JPEG encode settings for thumbnails: baseline (non-progressive),
+# no Huffman-table optimization pass, 4:2:0 chroma subsampling. Keeps
+# the encode on libjpeg-turbo's SIMD fast path; at 400 px the quality
+# difference is invisible. (Ensure the runtime Pillow is linked against
+# libjpeg-turbo — the official wheels are.)
+_THUMB_JPEG_OPTS = {
+    "quality": 85,
+    "optimize": False,
+    "progressive": False,
+    "subsampling": "4:2:0",
+}
+
 
 def calculate_file_hash(file_path: str) -> str:
     """
@@ -26,19 +69,96 @@ def calculate_file_hash(file_path: str) -> str:
         file_path (str): Path to the image file.
         
     Returns:
-        str: Hexadecimal string representing the SHA-256 hash.
-        
+        str: Hexadecimal content fingerprint (SHA-256, or BLAKE3 when
+             USE_BLAKE3=1 and the package is installed).
+
     Notes:
-        Reads the file in chunks to avoid memory issues with large files.
+        - BLAKE3 hashes via update_mmap, which maps the file and runs
+          the SIMD tree hash over it in one call.
+        - hashlib is OpenSSL-backed, so this runs on the SHA-NI fast
+          path of modern CPUs.
+        - file_digest (Python 3.11+) pumps the file through a large
+          internal buffer in C, with no Python-level chunk loop at all;
+          older interpreters fall back to 1 MiB chunks.
     """
-    sha256_hash = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        # Read in 4KB chunks
-        for byte_block in iter(lambda: f.read(4096), b""):
-            sha256_hash.update(byte_block)
+    if _USE_BLAKE3:
+        h = blake3()
+        h.update_mmap(file_path)
+        return h.hexdigest()
+
+    with open(file_path, "rb", buffering=0) as f:
+        # Map the file and hash it in one C call: no Python chunk loop,
+        # no copies — the kernel pages data straight into the digest.
+        try:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                return hashlib.sha256(mm).hexdigest()
+        except (ValueError, OSError):
+            pass  # Empty or unmappable file; fall through
+
+        # Non-mmap fallback: photos comfortably fit in RAM, so a single
+        # one-shot digest call beats an update loop (no per-chunk Python
+        # to C transitions between SHA-NI bursts). Stream only outliers.
+        if os.fstat(f.fileno()).st_size < (64 << 20):
+            return hashlib.sha256(f.read()).hexdigest()
+
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").hexdigest()
+        sha256_hash = hashlib.sha256()
+        while chunk := f.read(1 << 20):
+            sha256_hash.update(chunk)
     return sha256_hash.hexdigest()
 
 
+def _parse_exif_timestamp(date_str: str) -> Optional[datetime]:
+    """Slice-parses the fixed 'YYYY:MM:DD HH:MM:SS' EXIF layout."""
+    try:
+        return datetime(
+            int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]),
+            int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19])
+        )
+    except (ValueError, IndexError, TypeError):
+        return None
+
+
+def _read_exif_fields(img: Image.Image, metadata: Dict[str, Any]) -> None:
+    """
+    Fills camera_model / captured_at from EXIF without decoding pixels.
+
+    getexif() parses only the header segments (load() is never called),
+    and fetching the three tags by id skips building the full
+    name-decoded tag dictionary that _getexif() constructs per image.
+    """
+    exif = img.getexif()
+    if not exif:
+        return
+    metadata["camera_model"] = exif.get(0x0110) or "Unknown"  # Model
+    date_str = exif.get_ifd(0x8769).get(0x9003) or exif.get(0x0132)  # DateTimeOriginal / DateTime
+    if date_str:
+        metadata["captured_at"] = _parse_exif_timestamp(date_str)
+
+
+def calculate_stream_hash(fileobj) -> str:
+    """
+    Function: calculate_stream_hash
+
+    Description:
+        Hashes a readable binary stream in 1 MiB chunks with the same
+        algorithm calculate_file_hash uses. For content that is not on
+        disk yet (e.g. ZIP entries coming off the decompressor), so
+        duplicates can be detected without materializing the bytes.
+
+    Args:
+        fileobj: Any object with a read(size) method.
+
+    Returns:
+        str: Hexadecimal content fingerprint.
+    """
+    h = blake3() if _USE_BLAKE3 else hashlib.sha256()
+    while chunk := fileobj.read(1 << 20):
+        h.update(chunk)
+    return h.hexdigest()
+
+
 def extract_metadata(file_path: str) -> Dict[str, Any]:
     """
     Function: extract_metadata
@@ -68,25 +188,73 @@ def extract_metadata(file_path: str) -> Dict[str, Any]:
     try:
         with Image.open(file_path) as img:
             metadata["width"], metadata["height"] = img.size
-            
-            # Extract EXIF
-            exif_data = img._getexif()
-            if exif_data:
-                decoded_exif = {TAGS.get(key, key): val for key, val in exif_data.items()}
-                
-                # Extract Camera Model
-                metadata["camera_model"] = decoded_exif.get("Model", "Unknown")
-                
-                # Extract Timestamp (DateTimeOriginal is most reliable)
-                date_str = decoded_exif.get("DateTimeOriginal") or decoded_exif.get("DateTime")
-                if date_str:
+            _read_exif_fields(img, metadata)
+    except Exception as e:
+        logger.error(f"Failed to extract metadata for {file_path}: {e}")
+
+    return metadata
+
+
+def extract_metadata_and_thumbnail(file_path: str, thumb_path: Optional[str] = None,
+                                   size=(400, 400)) -> Dict[str, Any]:
+    """
+    Function: extract_metadata_and_thumbnail
+
+    Description:
+        Fused single-pass variant of extract_metadata + generate_thumbnail.
+        Reads the file once and serves both the metadata and the thumbnail
+        from the same in-memory buffer, instead of opening and decoding
+        the image twice.
+
+    Args:
+        file_path (str): Path to the image file.
+        thumb_path (Optional[str]): Where to save the thumbnail, or None
+                                    to skip thumbnail generation.
+        size (tuple): Maximum width and height of the thumbnail.
+
+    Returns:
+        Dict[str, Any]: Same shape as extract_metadata.
+
+    Notes:
+        During bulk ingest this halves the opens/reads per new image,
+        which dominates on cold cache for small files.
+    """
+    metadata = {
+        "width": 0,
+        "height": 0,
+        "captured_at": None,
+        "camera_model": "Unknown",
+        "file_size": 0
+    }
+
+    try:
+        with open(file_path, "rb") as f:
+            data = f.read()
+        metadata["file_size"] = len(data)
+
+        with Image.open(io.BytesIO(data)) as img:
+            metadata["width"], metadata["height"] = img.size
+            _read_exif_fields(img, metadata)
+
+            if thumb_path is not None:
+                if _HAS_PYVIPS:
                     try:
-                        # Standard EXIF format is 'YYYY:MM:DD HH:MM:SS'
-                        metadata["captured_at"] = datetime.strptime(date_str, "%Y:%m:%d %H:%M:%S")
-                    except ValueError:
-                        metadata["captured_at"] = None
+                        thumb = pyvips.Image.thumbnail_buffer(data, size[0], height=size[1], size="down")
+                        thumb.jpegsave(thumb_path, Q=85)
+                        return metadata
+                    except Exception as e:
+                        logger.warning(f"pyvips thumbnail failed for {file_path}, falling back to PIL: {e}")
+                # For JPEGs, draft() decodes at 1/2 - 1/8 scale via
+                # libjpeg's native DCT scaling, so LANCZOS sees far
+                # fewer pixels. No-op for other formats.
+                if img.format == "JPEG":
+                    img.draft("RGB", size)
+                if img.mode in ("RGBA", "P"):
+                    img = img.convert("RGB")
+                img.thumbnail(size, Image.Resampling.LANCZOS)
+                img.save(thumb_path, "JPEG", **_THUMB_JPEG_OPTS)
     except Exception as e:
-        print(f"ERROR: Failed to extract metadata for {file_path}: {e}")
+        logger.error(f"Failed to process {file_path}: {e}")
 
     return metadata
 
@@ -108,18 +276,32 @@ def generate_thumbnail(source_path: str, target_path: str, size=(400, 400)) -> b
         
     Notes:
         - Maintains aspect ratio.
-        - Uses LANCZOS resampling for high quality.
+        - Prefers libvips' SIMD thumbnail path when available; otherwise
+          uses LANCZOS resampling for high quality.
         - Converts to RGB if source is RGBA (e.g., PNG).
     """
+    if _HAS_PYVIPS:
+        try:
+            thumb = pyvips.Image.thumbnail(source_path, size[0], height=size[1], size="down")
+            thumb.jpegsave(target_path, Q=85)
+            return True
+        except Exception as e:
+            logger.warning(f"pyvips thumbnail failed for {source_path}, falling back to PIL: {e}")
+
     try:
         with Image.open(source_path) as img:
+            # JPEG fast path: decode at reduced scale via libjpeg's DCT
+            # scaling before resampling (no-op for other formats)
+            if img.format == "JPEG":
+                img.draft("RGB", size)
+
             # Handle transparency (PNG/WebP to JPEG)
             if img.mode in ("RGBA", "P"):
                 img = img.convert("RGB")
-            
+
             img.thumbnail(size, Image.Resampling.LANCZOS)
-            img.save(target_path, "JPEG", quality=85)
+            img.save(target_path, "JPEG", **_THUMB_JPEG_OPTS)
             return True
     except Exception as e:
-        print(f"ERROR: Failed to generate thumbnail for {source_path}: {e}")
+        logger.error(f"Failed to generate thumbnail for {source_path}: {e}")
         return False
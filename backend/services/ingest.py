@@ -1,32 +1,106 @@
 import os
+import shutil
 import zipfile
-from typing import Dict
-from sqlmodel import Session, select
-from database import Image, Album
-from services.scanner import list_image_files
-from services.image_processor import calculate_file_hash, extract_metadata, generate_thumbnail
+import concurrent.futures
+from datetime import datetime
+from typing import Dict, List
+from slugify import slugify
+from sqlmodel import Session, select, col
+from sqlalchemy import insert as sa_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from database import Image, Album, HashCache
+from services.scanner import list_image_files, SUPPORTED_EXTENSIONS
+from services.image_processor import calculate_file_hash, calculate_stream_hash, extract_metadata_and_thumbnail
+from utils.log import get_logger
+
+logger = get_logger("ingest")
 
 # --- Configuration ---
 THUMBNAIL_DIR = "data/thumbnails"
 os.makedirs(THUMBNAIL_DIR, exist_ok=True)
 
-def extract_zip_in_place(zip_path: str):
+# Rows added between commits. Every commit is an fsync on SQLite, so a
+# commit per image turns a 10k-file import into 10k fsyncs.
+DB_BATCH_SIZE = 500
+
+def _safe_entry_path(target_dir: str, name: str) -> str:
+    """Joins an archive entry name under target_dir, dropping any
+    absolute/parent components (same sanitization extractall applies)."""
+    parts = [p for p in name.replace("\\", "/").split("/") if p not in ("", ".", "..")]
+    return os.path.join(target_dir, *parts)
+
+
+def _extract_zip_entry(zip_path: str, name: str, target_dir: str):
+    """Extracts one entry with large buffered copies. Opens its own
+    ZipFile handle — instances aren't safe to share across threads."""
+    out_path = _safe_entry_path(target_dir, name)
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    with zipfile.ZipFile(zip_path, 'r') as z:
+        with z.open(name) as src, open(out_path, 'wb', buffering=1 << 20) as dst:
+            shutil.copyfileobj(src, dst, length=1 << 20)
+
+
+def extract_new_zip_entries(zip_path: str, session: Session) -> Dict[str, str]:
     """
-    Function: extract_zip_in_place
-    Description: Extracts a ZIP file into a directory named after the ZIP.
+    Function: extract_new_zip_entries
+    Description:
+        Streams image entries out of a ZIP: each entry is hashed in
+        1 MiB chunks straight off the decompressor, duplicates already
+        in the database (or earlier in the archive) are skipped without
+        ever touching the filesystem, and only new entries are written
+        to disk — with 1 MiB buffered copies, in parallel, since zlib
+        releases the GIL.
+
+    Returns:
+        Dict[str, str]: extracted absolute path -> content hash, so the
+        import loop can reuse the hashes instead of re-reading the files
+        it just wrote.
     """
     target_dir = zip_path.replace('.zip', '')
     if os.path.exists(target_dir):
-        return target_dir # Already extracted
-        
-    print(f"INFO: Extracting {zip_path} to {target_dir}")
+        return {} # Already extracted
+
+    logger.info(f"Extracting {zip_path} to {target_dir}")
+    extracted: Dict[str, str] = {}
     try:
         with zipfile.ZipFile(zip_path, 'r') as z:
-            z.extractall(target_dir)
-        return target_dir
+            # Hash every image entry from the stream (no disk writes)
+            entry_hashes: Dict[str, str] = {}
+            for info in z.infolist():
+                if info.is_dir():
+                    continue
+                name = info.filename
+                dot = name.rfind('.')
+                if dot <= 0 or name[dot:].lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                with z.open(name) as src:
+                    entry_hashes[name] = calculate_stream_hash(src)
+
+        known = set()
+        if entry_hashes:
+            known = set(
+                session.exec(
+                    select(Image.file_hash).where(col(Image.file_hash).in_(set(entry_hashes.values())))
+                ).all()
+            )
+
+        new_entries = []
+        for name, entry_hash in entry_hashes.items():
+            if entry_hash in known:
+                logger.debug(f"Skipping duplicate ZIP entry {name}")
+                continue
+            known.add(entry_hash)  # dedup within the archive too
+            new_entries.append(name)
+
+        if new_entries:
+            with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 1)) as executor:
+                list(executor.map(lambda n: _extract_zip_entry(zip_path, n, target_dir), new_entries))
+            for name in new_entries:
+                out_path = os.path.abspath(_safe_entry_path(target_dir, name))
+                extracted[out_path] = entry_hashes[name]
     except Exception as e:
-        print(f"ERROR: Failed to extract ZIP {zip_path}: {e}")
-        return None
+        logger.error(f"Failed to extract ZIP {zip_path}: {e}")
+    return extracted
 
 def process_import(root_path: str, session: Session, owner_id: int) -> Dict[str, int]:
     """
@@ -35,52 +109,109 @@ def process_import(root_path: str, session: Session, owner_id: int) -> Dict[str,
         Core logic for ingesting files from a directory into the database.
         Handles duplicates, thumbnails, and album creation.
     """
-    print(f"INFO: Starting ingestion for {root_path} (Owner ID: {owner_id})")
+    logger.info(f"Starting ingestion for {root_path} (Owner ID: {owner_id})")
     
-    # Pre-scan for ZIP files and extract them
+    # Pre-scan for ZIP files: entries are deduped from the compressed
+    # stream and only new files land on disk
+    zip_hashes: Dict[str, str] = {}
     for root, dirs, files in os.walk(root_path):
         for file in files:
             if file.lower().endswith('.zip'):
                 zip_full_path = os.path.join(root, file)
-                extract_zip_in_place(zip_full_path)
-    
+                zip_hashes.update(extract_new_zip_entries(zip_full_path, session))
+
     # 1. Discover files (now includes extracted ones)
     image_paths = list_image_files(root_path)
-    print(f"INFO: Found {len(image_paths)} potential images.")
+    logger.info(f"Found {len(image_paths)} potential images.")
     
     stats = {"added": 0, "skipped": 0, "errors": 0}
-    
-    for file_path in image_paths:
+
+    # 2. Resolve hashes. The HashCache table maps path -> hash validated
+    # by (mtime_ns, size); on a re-scan of a stable library virtually
+    # every file hits the cache and nothing is re-read.
+    stat_by_path: Dict[str, tuple] = {}
+    for p in image_paths:
         try:
-            # 2. Duplicate Check (Hash)
-            file_hash = calculate_file_hash(file_path)
-            
-            existing_image = session.exec(select(Image).where(Image.file_hash == file_hash)).first()
-            if existing_image:
-                if existing_image.is_deleted:
-                     print(f"DEBUG: Skipping deleted image {os.path.basename(file_path)} (Soft Deleted)")
-                else:
-                     print(f"DEBUG: Skipping duplicate {os.path.basename(file_path)}")
-                stats["skipped"] += 1
-                continue
-            
-            # 3. Metadata & Thumbnail
-            metadata = extract_metadata(file_path)
-            
-            # Generate Thumbnail
-            thumb_filename = f"{file_hash}.jpg"
-            thumb_path = os.path.join(THUMBNAIL_DIR, thumb_filename)
-            
-            if not os.path.exists(thumb_path):
-                generate_thumbnail(file_path, thumb_path)
-                
-            # 4. Album Management
-            parent_dir = os.path.dirname(file_path)
-            album_name = os.path.basename(parent_dir)
-            
-            from slugify import slugify
-            album_slug = slugify(album_name)
-            
+            st = os.stat(p)
+            stat_by_path[p] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            logger.error(f"Failed to stat {p}: {e}")
+
+    # IN binds one parameter per element, so chunk the lookup to stay
+    # under SQLite's bound-parameter limit on large libraries.
+    hash_by_path: Dict[str, str] = {}
+    for start in range(0, len(image_paths), 500):
+        chunk = image_paths[start : start + 500]
+        for row in session.exec(select(HashCache).where(col(HashCache.path).in_(chunk))).all():
+            st = stat_by_path.get(row.path)
+            if st is not None and st == (row.mtime_ns, row.size):
+                hash_by_path[row.path] = row.file_hash
+
+    # Entries just streamed out of ZIPs were hashed during extraction;
+    # seed them as fresh so they reach the cache without a re-read
+    fresh: Dict[str, str] = {}
+    for p, h in zip_hashes.items():
+        if p in stat_by_path and p not in hash_by_path:
+            hash_by_path[p] = h
+            fresh[p] = h
+
+    # 2a. Hash the cache misses across a thread pool. hashlib releases
+    # the GIL, so this uses all cores and overlaps SSD read stalls
+    # instead of hashing files strictly one by one.
+    to_hash = [p for p in stat_by_path if p not in hash_by_path]
+    if to_hash:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            future_map = {executor.submit(calculate_file_hash, p): p for p in to_hash}
+            for future in concurrent.futures.as_completed(future_map):
+                path = future_map[future]
+                try:
+                    fresh[path] = future.result()
+                except Exception as e:
+                    logger.error(f"Failed to hash {path}: {e}")
+        hash_by_path.update(fresh)
+
+    # 2b. Write the freshly computed hashes back to the cache (upsert:
+    # a changed file replaces its stale row). Chunked to stay under
+    # SQLite's bound-parameter limit.
+    fresh_rows = [
+        {"path": p, "mtime_ns": stat_by_path[p][0], "size": stat_by_path[p][1], "file_hash": h}
+        for p, h in fresh.items()
+    ]
+    for start in range(0, len(fresh_rows), 500):
+        stmt = sqlite_insert(HashCache).values(fresh_rows[start : start + 500])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["path"],
+            set_={
+                "mtime_ns": stmt.excluded.mtime_ns,
+                "size": stmt.excluded.size,
+                "file_hash": stmt.excluded.file_hash,
+            },
+        )
+        session.exec(stmt)
+    if fresh_rows:
+        session.commit()
+
+    # 3. Bulk Duplicate Check: chunked IN queries over every hash in the
+    # run instead of a SELECT per file (chunked for the same
+    # bound-parameter limit as above)
+    existing: Dict[str, bool] = {}
+    run_hashes = list(set(hash_by_path.values()))
+    for start in range(0, len(run_hashes), 500):
+        existing.update(
+            session.exec(
+                select(Image.file_hash, Image.is_deleted)
+                .where(col(Image.file_hash).in_(run_hashes[start : start + 500]))
+            ).all()
+        )
+
+    # Albums resolved once per slug for the whole run, not once per image
+    albums_by_slug: Dict[str, Album] = {}
+
+    def _resolve_album(parent_dir: str) -> Album:
+        album_name = os.path.basename(parent_dir)
+        album_slug = slugify(album_name)
+        album = albums_by_slug.get(album_slug)
+        if album is None:
             album = session.exec(select(Album).where(Album.slug == album_slug)).first()
             if not album:
                 album = Album(
@@ -90,32 +221,94 @@ def process_import(root_path: str, session: Session, owner_id: int) -> Dict[str,
                     owner_id=owner_id
                 )
                 session.add(album)
-                session.commit()
-                session.refresh(album)
-            
-            # 5. Save Image Record
-            new_image = Image(
-                album_id=album.id,
-                filename=os.path.basename(file_path),
-                path=file_path,
-                file_hash=file_hash,
-                captured_at=metadata.get("captured_at"),
-                width=metadata.get("width"),
-                height=metadata.get("height"),
-                file_size=metadata.get("file_size"),
-                camera_model=metadata.get("camera_model"),
-                is_processed=False, # Ready for AI processing later
-                owner_id=owner_id
-            )
-            
-            session.add(new_image)
+                session.flush()  # assigns the id without forcing an fsync
+            albums_by_slug[album_slug] = album
+        return album
+
+    # 4. Decide what is new (pure dict work, no I/O)
+    new_files = []
+    for file_path in image_paths:
+        file_hash = hash_by_path.get(file_path)
+        if file_hash is None:
+            stats["errors"] += 1
+            continue
+
+        if file_hash in existing:
+            if existing[file_hash]:
+                 logger.debug(f"Skipping deleted image {os.path.basename(file_path)} (Soft Deleted)")
+            else:
+                 logger.debug(f"Skipping duplicate {os.path.basename(file_path)}")
+            stats["skipped"] += 1
+            continue
+        existing[file_hash] = False  # dedup within the run itself
+        new_files.append((file_path, file_hash))
+
+    # 5. Metadata & Thumbnails across a thread pool: reads for upcoming
+    # files overlap with decode/resample of the current ones (the image
+    # codecs release the GIL), which keeps the disk queue full instead
+    # of alternating between a read stall and a CPU burst per file.
+    def _prepare(entry):
+        file_path, file_hash = entry
+        thumb_path = os.path.join(THUMBNAIL_DIR, f"{file_hash}.jpg")
+        return extract_metadata_and_thumbnail(
+            file_path,
+            thumb_path if not os.path.exists(thumb_path) else None
+        )
+
+    metadata_list = []
+    if new_files:
+        with concurrent.futures.ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            metadata_list = list(executor.map(_prepare, new_files))
+
+    # 6. Sequential DB writeback with batched commits. Globals and
+    # attribute chains are hoisted out of the loop — at 10^5 files the
+    # repeated lookups are measurable interpreter overhead.
+    basename = os.path.basename
+    dirname = os.path.dirname
+    insert_rows: List[dict] = []
+
+    def _flush_rows():
+        # One executemany INSERT per batch: a single prepared statement
+        # driven in C, instead of per-object ORM flush bookkeeping.
+        # (The COPY equivalent for SQLite.)
+        if insert_rows:
+            session.execute(sa_insert(Image), insert_rows)
             session.commit()
+            insert_rows.clear()
+
+    for (file_path, file_hash), metadata in zip(new_files, metadata_list):
+        try:
+            album = _resolve_album(dirname(file_path))
+
+            # metadata always carries every key (extract_metadata_and_
+            # thumbnail fills defaults), so index directly instead of
+            # .get. Model-level defaults don't apply on Core inserts, so
+            # is_deleted/created_at are set explicitly.
+            insert_rows.append({
+                "album_id": album.id,
+                "owner_id": owner_id,
+                "filename": basename(file_path),
+                "path": file_path,
+                "file_hash": file_hash,
+                "captured_at": metadata["captured_at"],
+                "width": metadata["width"],
+                "height": metadata["height"],
+                "file_size": metadata["file_size"],
+                "camera_model": metadata["camera_model"],
+                "is_processed": False, # Ready for AI processing later
+                "is_deleted": False,
+                "created_at": datetime.utcnow()
+            })
             stats["added"] += 1
-            
+            if len(insert_rows) >= DB_BATCH_SIZE:
+                _flush_rows()
+
         except Exception as e:
-            print(f"ERROR: Failed to process {file_path}: {e}")
+            logger.error(f"Failed to process {file_path}: {e}")
             stats["errors"] += 1
             continue
-            
-    print(f"INFO: Ingestion complete. Stats: {stats}")
+
+    _flush_rows()
+    session.commit()
+    logger.info(f"Ingestion complete. Stats: {stats}")
     return stats
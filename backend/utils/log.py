@@ -0,0 +1,37 @@
+"""
+Non-blocking logging for the hot ingest/AI paths.
+
+print() grabs the stdout lock under the GIL and can issue a syscall per
+call, which serializes the thread pools the ingest and AI pipelines run
+on. Workers here only enqueue the record (cheap, lock-free in practice);
+a single QueueListener thread does the actual stream writes.
+
+The formatter mirrors the project's established "LEVEL: message"
+console style, so output looks the same as the old prints.
+"""
+
+import logging
+import logging.handlers
+import queue
+
+_log_queue: "queue.Queue" = queue.Queue(-1)
+_listener = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger whose records are handed off to a shared background
+    listener thread. The listener is started lazily on first use.
+    """
+    global _listener
+    if _listener is None:
+        root = logging.getLogger("ai_gallery")
+        root.setLevel(logging.DEBUG)
+        root.propagate = False
+        root.addHandler(logging.handlers.QueueHandler(_log_queue))
+
+        stream = logging.StreamHandler()
+        stream.setFormatter(logging.Formatter("%(levelname)s: %(message)s"))
+        _listener = logging.handlers.QueueListener(_log_queue, stream)
+        _listener.start()
+    return logging.getLogger(f"ai_gallery.{name}")
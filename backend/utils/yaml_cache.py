@@ -0,0 +1,72 @@
+"""
+Caches parsed YAML files keyed by (path, mtime, size) so hot paths don't
+re-run yaml.safe_load on every access. A stat() call per lookup is all it
+costs to detect edits made through the Settings page or by hand.
+
+Dependencies:
+    - pyyaml: For the actual parsing on cache misses.
+"""
+
+import copy
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Tuple
+
+import yaml
+
+# path -> (mtime, size, parsed dict); LRU-ordered, oldest evicted first
+_yaml_cache: "OrderedDict[str, Tuple[float, int, Dict[str, Any]]]" = OrderedDict()
+_MAX_ENTRIES = 100
+
+
+def _load(path: str) -> Dict[str, Any]:
+    st = os.stat(path)
+    cached = _yaml_cache.get(path)
+    if cached is not None and cached[0] == st.st_mtime and cached[1] == st.st_size:
+        _yaml_cache.move_to_end(path)
+        return cached[2]
+
+    with open(path, "r") as f:
+        content = yaml.safe_load(f)
+
+    _yaml_cache[path] = (st.st_mtime, st.st_size, content)
+    _yaml_cache.move_to_end(path)
+    while len(_yaml_cache) > _MAX_ENTRIES:
+        _yaml_cache.popitem(last=False)
+    return content
+
+
+def load_yaml_cached(path: str) -> Dict[str, Any]:
+    """
+    Function: load_yaml_cached
+
+    Description:
+        Returns the parsed content of a YAML file, re-parsing only when
+        the file's mtime or size changed since the last read.
+
+    Args:
+        path (str): Path to the YAML file.
+
+    Returns:
+        Dict[str, Any]: A deep copy of the parsed content — safe for
+                        callers that mutate the result.
+    """
+    return copy.deepcopy(_load(path))
+
+
+def load_yaml_readonly(path: str) -> Dict[str, Any]:
+    """
+    Function: load_yaml_readonly
+
+    Description:
+        Same as load_yaml_cached but returns the cached object directly,
+        skipping the deep copy. Callers MUST treat the result as
+        read-only.
+
+    Args:
+        path (str): Path to the YAML file.
+
+    Returns:
+        Dict[str, Any]: The shared cached content (do not mutate).
+    """
+    return _load(path)
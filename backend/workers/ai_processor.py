@@ -5,20 +5,84 @@ Runs in a separate process to avoid blocking the main API.
 
 import sys
 import os
+import concurrent.futures
 
 # Add parent directory to path so we can import from backend root
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-from sqlmodel import Session, select
+from sqlmodel import Session, select, col
+from sqlalchemy import update as sa_update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database import engine, Image, Tag, ImageTagLink
 from services.ai_engine import analyze_batch
+from utils.log import get_logger
+
+logger = get_logger("ai_processor")
+
+def _save_batch_results(batch_tuples, image_ids, batch_results):
+    """
+    Set-based writeback for one batch: one tag upsert, one link upsert
+    and one UPDATE instead of O(images x tags) SELECT/INSERT round-trips
+    with a commit (= fsync) per new tag. Opens its own session so it can
+    run on the writeback thread.
+    """
+    with Session(engine) as session:
+        # All distinct tag names across the batch
+        tag_specs = {}
+        for tags_data in batch_results:
+            for tag_item in tags_data:
+                tag_specs.setdefault(tag_item["name"], tag_item.get("category", "general"))
+
+        name_to_id = {}
+        if tag_specs:
+            session.exec(
+                sqlite_insert(Tag)
+                .values([{"name": n, "category": c} for n, c in tag_specs.items()])
+                .on_conflict_do_nothing(index_elements=["name"])
+            )
+            name_to_id = dict(
+                session.exec(
+                    select(Tag.name, Tag.id).where(col(Tag.name).in_(set(tag_specs)))
+                ).all()
+            )
+
+        link_rows = []
+        for (img_id, _), tags_data in zip(batch_tuples, batch_results):
+            for tag_item in tags_data:
+                tag_id = name_to_id.get(tag_item["name"])
+                if tag_id is None:
+                    continue
+                link_rows.append({
+                    "image_id": img_id,
+                    "tag_id": tag_id,
+                    "confidence": tag_item["confidence"],
+                    "source": tag_item["source"],
+                    "is_verified": False
+                })
+
+        if link_rows:
+            # ON CONFLICT DO NOTHING keeps re-runs idempotent
+            session.exec(
+                sqlite_insert(ImageTagLink)
+                .values(link_rows)
+                .on_conflict_do_nothing(index_elements=["image_id", "tag_id"])
+            )
+
+        session.exec(
+            sa_update(Image).where(col(Image.id).in_(image_ids)).values(is_processed=True)
+        )
+        session.commit()
+
 
 def run_ai_processing_task():
     """
     Worker function that fetches unprocessed images and runs AI analysis.
     """
-    print("[Worker] AI Processor started.")
-    BATCH_SIZE = 8 # Adjust based on RAM/VRAM
+    logger.info("[Worker] AI Processor started.")
+    # Decode/preprocess now runs in DataLoader workers with pinned
+    # buffers, so the GPU is fed fast enough to make larger batches
+    # worthwhile. Adjust based on RAM/VRAM.
+    BATCH_SIZE = 32
     
     # 1. Fetch Worklist
     # We create a session just to get the IDs, then close it.
@@ -31,84 +95,51 @@ def run_ai_processing_task():
         worklist = [(r[0], r[1]) for r in results]
         
     total_images = len(worklist)
-    print(f"[Worker] Found {total_images} images to process.")
+    logger.info(f"[Worker] Found {total_images} images to process.")
     
     if total_images == 0:
         return
 
-    # 2. Process in Batches
-    for i in range(0, total_images, BATCH_SIZE):
-        batch_tuples = worklist[i : i + BATCH_SIZE]
-        image_ids = [b[0] for b in batch_tuples]
-        image_paths = [b[1] for b in batch_tuples]
-        
-        print(f"[Worker] Processing batch {i // BATCH_SIZE + 1} / {(total_images + BATCH_SIZE - 1) // BATCH_SIZE}...")
-        
-        try:
-            # A. Heavy Lifting (AI Models)
-            # This is the slow part, running independently.
-            batch_results = analyze_batch(image_paths)
-            
-            # B. Save Results
-            with Session(engine) as session:
-                # Fetch images again to attach to this session
-                batch_images = session.exec(select(Image).where(Image.id.in_(image_ids))).all()
-                img_map = {img.id: img for img in batch_images}
-                
-                for idx, (img_id, img_path) in enumerate(batch_tuples):
-                    img = img_map.get(img_id)
-                    if not img: continue
-                    
-                    tags_data = batch_results[idx]
-                    
-                    if not tags_data:
-                        img.is_processed = True
-                        session.add(img)
-                        continue
-
-                    for tag_item in tags_data:
-                        tag_name = tag_item["name"]
-                        confidence = tag_item["confidence"]
-                        source = tag_item["source"]
-                        category = tag_item.get("category", "general")
-                        
-                        # Find or Create Tag
-                        tag = session.exec(select(Tag).where(Tag.name == tag_name)).first()
-                        if not tag:
-                            tag = Tag(name=tag_name, category=category)
-                            session.add(tag)
-                            session.commit()
-                            session.refresh(tag)
-                        
-                        # Create Link
-                        # Check existence to avoid unique constraint errors if re-run
-                        existing_link = session.exec(
-                            select(ImageTagLink)
-                            .where(ImageTagLink.image_id == img.id)
-                            .where(ImageTagLink.tag_id == tag.id)
-                        ).first()
-                        
-                        if not existing_link:
-                            link = ImageTagLink(
-                                image_id=img.id,
-                                tag_id=tag.id,
-                                confidence=confidence,
-                                source=source,
-                                is_verified=False
-                            )
-                            session.add(link)
-                    
-                    img.is_processed = True
-                    session.add(img)
-                
-                session.commit()
-                
-        except Exception as e:
-            print(f"[Worker] ERROR in batch: {e}")
-            import traceback
-            traceback.print_exc()
-
-    print("[Worker] AI Processing finished.")
+    # 2. Process in Batches, double-buffered: while batch k commits to
+    # the DB on the writeback thread, batch k+1 already runs inference.
+    # Hides DB latency behind the GPU/CPU-bound analyze_batch call.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as db_executor:
+        pending_write = None
+
+        for i in range(0, total_images, BATCH_SIZE):
+            batch_tuples = worklist[i : i + BATCH_SIZE]
+            image_ids = [b[0] for b in batch_tuples]
+            image_paths = [b[1] for b in batch_tuples]
+
+            logger.info(f"[Worker] Processing batch {i // BATCH_SIZE + 1} / {(total_images + BATCH_SIZE - 1) // BATCH_SIZE}...")
+
+            try:
+                # A. Heavy Lifting (AI Models)
+                # This is the slow part, running independently.
+                batch_results = analyze_batch(image_paths)
+
+                # B. Save Results on the writeback thread. Wait for the
+                # previous batch first (queue depth 1) so a slow DB can't
+                # pile up unbounded pending work.
+                if pending_write is not None:
+                    pending_write.result()
+                pending_write = db_executor.submit(
+                    _save_batch_results, batch_tuples, image_ids, batch_results
+                )
+
+            except Exception as e:
+                logger.error(f"[Worker] Batch failed: {e}")
+                import traceback
+                traceback.print_exc()
+
+        # Drain the final writeback
+        if pending_write is not None:
+            try:
+                pending_write.result()
+            except Exception as e:
+                logger.error(f"[Worker] Final writeback failed: {e}")
+
+    logger.info("[Worker] AI Processing finished.")
 
 if __name__ == "__main__":
     run_ai_processing_task()
@@ -0,0 +1,14 @@
+"""
+Lightweight process-pool entry point for AI analysis.
+
+The API process imports this module to get a picklable reference it can
+submit to the worker pool, so it must stay import-cheap: the heavy
+workers.ai_processor module (torch, transformers, easyocr) is imported
+lazily inside the function and therefore only ever loads in the worker
+process, never in the API server.
+"""
+
+
+def run_ai_processing_task():
+    from workers.ai_processor import run_ai_processing_task as _run
+    _run()